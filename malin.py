@@ -5,35 +5,85 @@ SQLite database with FastAPI
 Port: 9022
 """
 
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.routing import APIRoute
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import sqlite3
+import aiosqlite
+import asyncio
+import os
 import uvicorn
 from datetime import datetime, timedelta
 import uuid
-import json
+import orjson
+from cachetools import TTLCache
 
-app = FastAPI(title="SimCard Management API", version="1.0.0")
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson"""
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
 
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+class ORJSONRequest(Request):
+    """Request whose JSON body is parsed with orjson"""
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            # orjson.JSONDecodeError subclasses json.JSONDecodeError, so FastAPI still returns 422
+            self._json = orjson.loads(await self.body())
+        return self._json
+
+class ORJSONRoute(APIRoute):
+    """Route that hands request bodies to orjson instead of the stdlib json module"""
+    def get_route_handler(self):
+        route_handler = super().get_route_handler()
+
+        async def orjson_route_handler(request: Request) -> Response:
+            return await route_handler(ORJSONRequest(request.scope, request.receive))
+
+        return orjson_route_handler
 
 # Database setup
 DATABASE_NAME = "simcard_db.sqlite"
+POOL_SIZE = 8
+# Rows fetched per batch when streaming list endpoints
+STREAM_BATCH_SIZE = 500
+# Prepared statements kept per pooled connection, keyed by SQL text
+STATEMENT_CACHE_SIZE = 256
+
+# Dashboard statistics are cached briefly and invalidated by any write
+STATS_CACHE_TTL = 5
+stats_cache = TTLCache(maxsize=8, ttl=STATS_CACHE_TTL)
+data_version = 0
+
+# SQL expressions for new row ids and addedDate, matching str(uuid.uuid4()) and
+# the local datetime.now().isoformat() timestamps used everywhere else
+NEW_ID_SQL = ("lower(hex(randomblob(4))) || '-' || lower(hex(randomblob(2))) || '-4' || "
+              "substr(lower(hex(randomblob(2))), 2) || '-' || "
+              "substr('89ab', 1 + abs(random()) % 4, 1) || substr(lower(hex(randomblob(2))), 2) || '-' || "
+              "lower(hex(randomblob(6)))")
+NOW_SQL = "strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')"
+
+# Applied to every connection: WAL lets readers proceed while a writer commits
+SQLITE_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-64000",
+]
 
 def init_database():
     """Initialize SQLite database with tables"""
     conn = sqlite3.connect(DATABASE_NAME)
     cursor = conn.cursor()
     
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    
     # Shops table
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS shops (
@@ -46,11 +96,15 @@ def init_database():
             longitude REAL,
             status TEXT NOT NULL DEFAULT 'active',
             region TEXT NOT NULL,
-            assignedSimCards TEXT DEFAULT '[]',
             addedDate TEXT NOT NULL
         )
     """)
     
+    # assignedSimCards was redundant with simcards.assignedTo; drop it from older databases
+    cursor.execute("PRAGMA table_info(shops)")
+    if any(column[1] == "assignedSimCards" for column in cursor.fetchall()):
+        cursor.execute("ALTER TABLE shops DROP COLUMN assignedSimCards")
+    
     # SimCards table
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS simcards (
@@ -75,6 +129,13 @@ def init_database():
         )
     """)
     
+    # Indexes for frequently filtered and grouped columns
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sim_status ON simcards(status)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sim_assigned ON simcards(assignedTo)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sim_saledate ON simcards(saleDate)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_shops_region ON shops(region)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_shops_status ON shops(status)")
+    
     # Insert default admin user (only if doesn't exist)
     cursor.execute("""
         INSERT OR IGNORE INTO users (id, username, password, role)
@@ -85,14 +146,145 @@ def init_database():
     conn.close()
     print("Database initialized successfully!")
 
-def get_db():
-    """Get database connection"""
-    conn = sqlite3.connect(DATABASE_NAME)
-    conn.row_factory = sqlite3.Row
+class ConnectionPool:
+    """Fixed-size pool of long-lived aiosqlite connections"""
+    def __init__(self, size: int):
+        self.size = size
+        self.connections: List[aiosqlite.Connection] = []
+        self.queue: Optional[asyncio.Queue] = None
+        self.open_cursors: Dict[aiosqlite.Connection, List[aiosqlite.Cursor]] = {}
+        self.total_acquired = 0
+
+    async def open(self):
+        self.queue = asyncio.Queue()
+        for _ in range(self.size):
+            # Autocommit mode: write endpoints open their own transactions
+            conn = await aiosqlite.connect(DATABASE_NAME, cached_statements=STATEMENT_CACHE_SIZE,
+                                           isolation_level=None)
+            conn.row_factory = aiosqlite.Row
+            for pragma in SQLITE_PRAGMAS:
+                await conn.execute(pragma)
+            self.connections.append(conn)
+            self.queue.put_nowait(conn)
+
+    async def close(self):
+        for conn in self.connections:
+            await conn.close()
+        self.connections.clear()
+        self.queue = None
+
+    async def acquire(self) -> aiosqlite.Connection:
+        conn = await self.queue.get()
+        self.total_acquired += 1
+        return conn
+
+    def track_cursor(self, conn: aiosqlite.Connection, cursor: aiosqlite.Cursor):
+        """Close cursor on release even if its owner never finishes reading it"""
+        self.open_cursors.setdefault(conn, []).append(cursor)
+
+    async def release(self, conn: aiosqlite.Connection):
+        # Never hand out a connection with an active statement or a half-finished transaction
+        for cursor in self.open_cursors.pop(conn, []):
+            await cursor.close()
+        if conn.in_transaction:
+            await conn.rollback()
+        self.queue.put_nowait(conn)
+
+    def stats(self) -> Dict[str, int]:
+        available = self.queue.qsize() if self.queue else 0
+        return {
+            "size": self.size,
+            "available": available,
+            "inUse": len(self.connections) - available,
+            "totalAcquired": self.total_acquired
+        }
+
+db_pool = ConnectionPool(POOL_SIZE)
+
+# Connections borrowed by the current request, released by DBConnectionMiddleware
+db_ctx: ContextVar[Optional[List[aiosqlite.Connection]]] = ContextVar("db_ctx", default=None)
+
+class DBConnectionMiddleware:
+    """Returns any pooled connection borrowed by a request once its response is sent"""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        borrowed: List[aiosqlite.Connection] = []
+        token = db_ctx.set(borrowed)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            db_ctx.reset(token)
+            for db in borrowed:
+                await db_pool.release(db)
+
+async def get_db() -> aiosqlite.Connection:
+    """Get the request's pooled database connection, borrowing one on first use"""
+    borrowed = db_ctx.get()
+    if not borrowed:
+        borrowed.append(await db_pool.acquire())
+    return borrowed[0]
+
+async def stream_json_array(sql: str):
+    """Stream query rows as a JSON array of objects, one batch at a time"""
+    # The request keeps its connection until the streamed response has been sent
+    db = await get_db()
+    cursor = await db.execute(sql)
+    # A client disconnect can abandon this generator before its finally runs
+    db_pool.track_cursor(db, cursor)
+    try:
+        cursor.row_factory = None
+        columns = [column[0] for column in cursor.description]
+        yield b"["
+        separator = b""
+        while batch := await cursor.fetchmany(STREAM_BATCH_SIZE):
+            yield separator + orjson.dumps([dict(zip(columns, row)) for row in batch])[1:-1]
+            separator = b","
+        yield b"]"
+    finally:
+        # An unfinished SELECT pins an old WAL snapshot and breaks later writes on this connection
+        await cursor.close()
+
+@asynccontextmanager
+async def write_transaction(db: aiosqlite.Connection):
+    """Run a block inside BEGIN IMMEDIATE, committing on success"""
+    await db.execute("BEGIN IMMEDIATE")
     try:
-        yield conn
+        yield
+    except BaseException:
+        await db.rollback()
+        raise
+    await db.commit()
+    global data_version
+    data_version += 1
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await db_pool.open()
+    try:
+        yield
     finally:
-        conn.close()
+        await db_pool.close()
+
+app = FastAPI(title="SimCard Management API", version="1.0.0",
+              default_response_class=ORJSONResponse,
+              lifespan=lifespan)
+app.router.route_class = ORJSONRoute
+
+app.add_middleware(DBConnectionMiddleware)
+
+# CORS middleware
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
 
 # Pydantic models
 class LoginRequest(BaseModel):
@@ -133,11 +325,11 @@ class AssignSimCardsRequest(BaseModel):
 
 # Auth endpoints
 @app.post("/auth/login")
-async def login(request: LoginRequest, db = Depends(get_db)):
-    cursor = db.cursor()
-    cursor.execute("SELECT * FROM users WHERE username = ? AND password = ?", 
-                   (request.username, request.password))
-    user = cursor.fetchone()
+async def login(request: LoginRequest):
+    db = await get_db()
+    cursor = await db.execute("SELECT id, username, role FROM users WHERE username = ? AND password = ?", 
+                              (request.username, request.password))
+    user = await cursor.fetchone()
     
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
@@ -158,116 +350,91 @@ async def logout():
 
 # Shop endpoints
 @app.get("/shops")
-async def get_shops(db = Depends(get_db)):
-    cursor = db.cursor()
-    cursor.execute("SELECT * FROM shops ORDER BY addedDate DESC")
-    shops = cursor.fetchall()
-    
-    result = []
-    for shop in shops:
-        shop_dict = dict(shop)
-        shop_dict["assignedSimCards"] = json.loads(shop_dict["assignedSimCards"])
-        result.append(shop_dict)
-    
-    return result
+async def get_shops():
+    # Include per-shop simcard counts so clients don't need /shops/{id}/stats per row
+    return StreamingResponse(stream_json_array("""
+        SELECT 
+            s.id, s.name, s.ownerName, s.ownerPhone, s.address,
+            s.latitude, s.longitude, s.status, s.region, s.addedDate,
+            COUNT(CASE WHEN sc.status = 'assigned' THEN 1 END) as assigned,
+            COUNT(CASE WHEN sc.status = 'sold' THEN 1 END) as sold,
+            COUNT(sc.id) as total
+        FROM shops s
+        LEFT JOIN simcards sc ON sc.assignedTo = s.id
+        GROUP BY s.id
+        ORDER BY s.addedDate DESC
+    """), media_type="application/json")
 
 @app.post("/shops")
-async def create_shop(shop: ShopCreate, db = Depends(get_db)):
-    shop_id = str(uuid.uuid4())
-    cursor = db.cursor()
-    
-    cursor.execute("""
-        INSERT INTO shops 
-        (id, name, ownerName, ownerPhone, address, latitude, longitude, status, region, assignedSimCards, addedDate)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (shop_id, shop.name, shop.ownerName, shop.ownerPhone, shop.address,
-          shop.latitude, shop.longitude, "active", shop.region, "[]", datetime.now().isoformat()))
-    
-    db.commit()
-    
-    # Return created shop
-    cursor.execute("SELECT * FROM shops WHERE id = ?", (shop_id,))
-    created_shop = cursor.fetchone()
-    shop_dict = dict(created_shop)
-    shop_dict["assignedSimCards"] = json.loads(shop_dict["assignedSimCards"])
-    
-    return shop_dict
+async def create_shop(shop: ShopCreate):
+    db = await get_db()
+    async with write_transaction(db):
+        cursor = await db.execute(f"""
+            INSERT INTO shops 
+            (id, name, ownerName, ownerPhone, address, latitude, longitude, status, region, addedDate)
+            VALUES ({NEW_ID_SQL}, ?, ?, ?, ?, ?, ?, ?, ?, {NOW_SQL})
+            RETURNING id, name, ownerName, ownerPhone, address, latitude, longitude, status, region, addedDate
+        """, (shop.name, shop.ownerName, shop.ownerPhone, shop.address,
+              shop.latitude, shop.longitude, "active", shop.region))
+        created_shop = await cursor.fetchone()
+    
+    return dict(created_shop)
 
 @app.put("/shops/{shop_id}")
-async def update_shop(shop_id: str, shop: ShopUpdate, db = Depends(get_db)):
-    cursor = db.cursor()
-    
-    # Check if shop exists
-    cursor.execute("SELECT * FROM shops WHERE id = ?", (shop_id,))
-    existing_shop = cursor.fetchone()
-    if not existing_shop:
-        raise HTTPException(status_code=404, detail="Shop not found")
-    
-    # Build update query dynamically
-    update_fields = {}
-    if shop.name is not None:
-        update_fields["name"] = shop.name
-    if shop.ownerName is not None:
-        update_fields["ownerName"] = shop.ownerName
-    if shop.ownerPhone is not None:
-        update_fields["ownerPhone"] = shop.ownerPhone
-    if shop.address is not None:
-        update_fields["address"] = shop.address
-    if shop.latitude is not None:
-        update_fields["latitude"] = shop.latitude
-    if shop.longitude is not None:
-        update_fields["longitude"] = shop.longitude
-    if shop.status is not None:
-        update_fields["status"] = shop.status
-    if shop.region is not None:
-        update_fields["region"] = shop.region
-    
-    if update_fields:
-        set_clause = ", ".join([f"{key} = ?" for key in update_fields.keys()])
-        values = list(update_fields.values()) + [shop_id]
-        cursor.execute(f"UPDATE shops SET {set_clause} WHERE id = ?", values)
-        db.commit()
-    
-    # Return updated shop
-    cursor.execute("SELECT * FROM shops WHERE id = ?", (shop_id,))
-    updated_shop = cursor.fetchone()
-    shop_dict = dict(updated_shop)
-    shop_dict["assignedSimCards"] = json.loads(shop_dict["assignedSimCards"])
-    
-    return shop_dict
+async def update_shop(shop_id: str, shop: ShopUpdate):
+    db = await get_db()
+    async with write_transaction(db):
+        # Fixed statement: fields left as None keep their current value
+        cursor = await db.execute("""
+            UPDATE shops SET
+                name = COALESCE(?, name),
+                ownerName = COALESCE(?, ownerName),
+                ownerPhone = COALESCE(?, ownerPhone),
+                address = COALESCE(?, address),
+                latitude = COALESCE(?, latitude),
+                longitude = COALESCE(?, longitude),
+                status = COALESCE(?, status),
+                region = COALESCE(?, region)
+            WHERE id = ?
+            RETURNING id, name, ownerName, ownerPhone, address, latitude, longitude, status, region, addedDate
+        """, (shop.name, shop.ownerName, shop.ownerPhone, shop.address, shop.latitude,
+              shop.longitude, shop.status, shop.region, shop_id))
+        updated_shop = await cursor.fetchone()
+        if not updated_shop:
+            raise HTTPException(status_code=404, detail="Shop not found")
+    
+    return dict(updated_shop)
 
 @app.delete("/shops/{shop_id}")
-async def delete_shop(shop_id: str, db = Depends(get_db)):
-    cursor = db.cursor()
-    
-    # Check if shop exists
-    cursor.execute("SELECT * FROM shops WHERE id = ?", (shop_id,))
-    shop = cursor.fetchone()
-    if not shop:
-        raise HTTPException(status_code=404, detail="Shop not found")
-    
-    # Delete shop
-    cursor.execute("DELETE FROM shops WHERE id = ?", (shop_id,))
-    
-    # Update assigned simcards
-    cursor.execute("UPDATE simcards SET status = 'available', assignedTo = NULL, assignedShopName = NULL WHERE assignedTo = ?", (shop_id,))
+async def delete_shop(shop_id: str):
+    db = await get_db()
+    async with write_transaction(db):
+        # Check if shop exists
+        cursor = await db.execute("SELECT 1 FROM shops WHERE id = ? LIMIT 1", (shop_id,))
+        shop = await cursor.fetchone()
+        if not shop:
+            raise HTTPException(status_code=404, detail="Shop not found")
+        
+        # Delete shop
+        await db.execute("DELETE FROM shops WHERE id = ?", (shop_id,))
+        
+        # Update assigned simcards
+        await db.execute("UPDATE simcards SET status = 'available', assignedTo = NULL, assignedShopName = NULL WHERE assignedTo = ?", (shop_id,))
     
-    db.commit()
     return {"success": True}
 
 @app.get("/shops/{shop_id}/stats")
-async def get_shop_stats(shop_id: str, db = Depends(get_db)):
-    cursor = db.cursor()
-    
+async def get_shop_stats(shop_id: str):
+    db = await get_db()
     # Check if shop exists
-    cursor.execute("SELECT * FROM shops WHERE id = ?", (shop_id,))
-    shop = cursor.fetchone()
+    cursor = await db.execute("SELECT name FROM shops WHERE id = ?", (shop_id,))
+    shop = await cursor.fetchone()
     if not shop:
         raise HTTPException(status_code=404, detail="Shop not found")
     
     # Get simcard stats for this shop
-    cursor.execute("SELECT status, COUNT(*) as count FROM simcards WHERE assignedTo = ? GROUP BY status", (shop_id,))
-    stats = cursor.fetchall()
+    cursor = await db.execute("SELECT status, COUNT(*) as count FROM simcards WHERE assignedTo = ? GROUP BY status", (shop_id,))
+    stats = await cursor.fetchall()
     
     result = {
         "shopId": shop_id,
@@ -288,121 +455,100 @@ async def get_shop_stats(shop_id: str, db = Depends(get_db)):
 
 # SimCard endpoints
 @app.get("/simcards")
-async def get_simcards(db = Depends(get_db)):
-    cursor = db.cursor()
-    cursor.execute("SELECT * FROM simcards ORDER BY addedDate DESC")
-    simcards = cursor.fetchall()
-    
-    return [dict(simcard) for simcard in simcards]
+async def get_simcards():
+    return StreamingResponse(stream_json_array("""
+        SELECT id, code, status, assignedTo, assignedShopName, addedDate, saleDate
+        FROM simcards ORDER BY addedDate DESC
+    """), media_type="application/json")
 
 @app.post("/simcards")
-async def create_simcard(simcard: SimCardCreate, db = Depends(get_db)):
-    simcard_id = str(uuid.uuid4())
-    cursor = db.cursor()
-    
+async def create_simcard(simcard: SimCardCreate):
+    db = await get_db()
     try:
-        cursor.execute("""
-            INSERT INTO simcards 
-            (id, code, status, assignedTo, assignedShopName, addedDate, saleDate, lastChecked)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (simcard_id, simcard.code, "available", None, None, datetime.now().isoformat(), None, None))
-        
-        db.commit()
-        
-        # Return created simcard
-        cursor.execute("SELECT * FROM simcards WHERE id = ?", (simcard_id,))
-        created_simcard = cursor.fetchone()
+        async with write_transaction(db):
+            cursor = await db.execute(f"""
+                INSERT INTO simcards 
+                (id, code, status, assignedTo, assignedShopName, addedDate, saleDate, lastChecked)
+                VALUES ({NEW_ID_SQL}, ?, ?, ?, ?, {NOW_SQL}, ?, ?)
+                RETURNING id, code, status, assignedTo, assignedShopName, addedDate, saleDate, lastChecked
+            """, (simcard.code, "available", None, None, None, None))
+            created_simcard = await cursor.fetchone()
         
         return dict(created_simcard)
     except sqlite3.IntegrityError:
         raise HTTPException(status_code=400, detail="SimCard code already exists")
 
 @app.put("/simcards/{simcard_id}")
-async def update_simcard(simcard_id: str, simcard: SimCardUpdate, db = Depends(get_db)):
-    cursor = db.cursor()
-    
-    # Check if simcard exists
-    cursor.execute("SELECT * FROM simcards WHERE id = ?", (simcard_id,))
-    existing_simcard = cursor.fetchone()
-    if not existing_simcard:
-        raise HTTPException(status_code=404, detail="SimCard not found")
-    
-    # Build update query dynamically
-    update_fields = {}
-    if simcard.code is not None:
-        update_fields["code"] = simcard.code
-    if simcard.status is not None:
-        update_fields["status"] = simcard.status
-        if simcard.status == "sold":
-            update_fields["saleDate"] = datetime.now().isoformat()
-    if simcard.assignedTo is not None:
-        update_fields["assignedTo"] = simcard.assignedTo
-    if simcard.assignedShopName is not None:
-        update_fields["assignedShopName"] = simcard.assignedShopName
-    
-    if update_fields:
-        set_clause = ", ".join([f"{key} = ?" for key in update_fields.keys()])
-        values = list(update_fields.values()) + [simcard_id]
-        cursor.execute(f"UPDATE simcards SET {set_clause} WHERE id = ?", values)
-        db.commit()
-    
-    # Return updated simcard
-    cursor.execute("SELECT * FROM simcards WHERE id = ?", (simcard_id,))
-    updated_simcard = cursor.fetchone()
+async def update_simcard(simcard_id: str, simcard: SimCardUpdate):
+    db = await get_db()
+    sale_date = datetime.now().isoformat() if simcard.status == "sold" else None
+    
+    async with write_transaction(db):
+        # Fixed statement: fields left as None keep their current value
+        cursor = await db.execute("""
+            UPDATE simcards SET
+                code = COALESCE(?, code),
+                status = COALESCE(?, status),
+                saleDate = COALESCE(?, saleDate),
+                assignedTo = COALESCE(?, assignedTo),
+                assignedShopName = COALESCE(?, assignedShopName)
+            WHERE id = ?
+            RETURNING id, code, status, assignedTo, assignedShopName, addedDate, saleDate, lastChecked
+        """, (simcard.code, simcard.status, sale_date, simcard.assignedTo,
+              simcard.assignedShopName, simcard_id))
+        updated_simcard = await cursor.fetchone()
+        if not updated_simcard:
+            raise HTTPException(status_code=404, detail="SimCard not found")
     
     return dict(updated_simcard)
 
 @app.delete("/simcards/{simcard_id}")
-async def delete_simcard(simcard_id: str, db = Depends(get_db)):
-    cursor = db.cursor()
-    
-    # Check if simcard exists
-    cursor.execute("SELECT * FROM simcards WHERE id = ?", (simcard_id,))
-    simcard = cursor.fetchone()
-    if not simcard:
-        raise HTTPException(status_code=404, detail="SimCard not found")
-    
-    # Delete simcard
-    cursor.execute("DELETE FROM simcards WHERE id = ?", (simcard_id,))
-    db.commit()
+async def delete_simcard(simcard_id: str):
+    db = await get_db()
+    async with write_transaction(db):
+        # Check if simcard exists
+        cursor = await db.execute("SELECT 1 FROM simcards WHERE id = ? LIMIT 1", (simcard_id,))
+        simcard = await cursor.fetchone()
+        if not simcard:
+            raise HTTPException(status_code=404, detail="SimCard not found")
+        
+        # Delete simcard
+        await db.execute("DELETE FROM simcards WHERE id = ?", (simcard_id,))
     
     return {"success": True}
 
 @app.post("/simcards/assign")
-async def assign_simcards_to_shop(request: AssignSimCardsRequest, db = Depends(get_db)):
-    cursor = db.cursor()
-    
-    # Check if shop exists
-    cursor.execute("SELECT * FROM shops WHERE id = ?", (request.shopId,))
-    shop = cursor.fetchone()
-    if not shop:
-        raise HTTPException(status_code=404, detail="Shop not found")
-    
-    # Get available simcards
-    cursor.execute("SELECT * FROM simcards WHERE status = 'available' LIMIT ?", (request.count,))
-    available_simcards = cursor.fetchall()
-    
-    if len(available_simcards) < request.count:
-        raise HTTPException(status_code=400, detail=f"Only {len(available_simcards)} simcards available")
-    
-    # Assign simcards
-    assigned_cards = []
-    for simcard in available_simcards:
-        cursor.execute("""
+async def assign_simcards_to_shop(request: AssignSimCardsRequest):
+    db = await get_db()
+    async with write_transaction(db):
+        # Check if shop exists
+        cursor = await db.execute("SELECT name FROM shops WHERE id = ?", (request.shopId,))
+        shop = await cursor.fetchone()
+        if not shop:
+            raise HTTPException(status_code=404, detail="Shop not found")
+        
+        # Get available simcards
+        cursor = await db.execute("SELECT id, code FROM simcards WHERE status = 'available' LIMIT ?", (request.count,))
+        available_simcards = await cursor.fetchall()
+        
+        if len(available_simcards) < request.count:
+            raise HTTPException(status_code=400, detail=f"Only {len(available_simcards)} simcards available")
+        
+        # Assign all selected simcards in a single statement
+        simcard_ids = [simcard["id"] for simcard in available_simcards]
+        await db.execute("""
             UPDATE simcards 
             SET status = 'assigned', assignedTo = ?, assignedShopName = ?
-            WHERE id = ?
-        """, (request.shopId, shop["name"], simcard["id"]))
+            WHERE id IN (SELECT value FROM json_each(?))
+        """, (request.shopId, shop["name"], orjson.dumps(simcard_ids).decode()))
         
-        assigned_cards.append({
+        assigned_cards = [{
             "id": simcard["id"],
             "code": simcard["code"],
             "status": "assigned",
             "assignedTo": request.shopId,
             "assignedShopName": shop["name"]
-        })
-    
-    db.commit()
+        } for simcard in available_simcards]
     
     return {
         "success": True,
@@ -410,51 +556,58 @@ async def assign_simcards_to_shop(request: AssignSimCardsRequest, db = Depends(g
     }
 
 @app.get("/simcards/{simcard_id}/check-status")
-async def check_simcard_status(simcard_id: str, db = Depends(get_db)):
-    cursor = db.cursor()
-    cursor.execute("SELECT * FROM simcards WHERE id = ?", (simcard_id,))
-    simcard = cursor.fetchone()
-    
-    if not simcard:
-        raise HTTPException(status_code=404, detail="SimCard not found")
-    
-    # Update lastChecked
-    cursor.execute("UPDATE simcards SET lastChecked = ? WHERE id = ?", 
-                   (datetime.now().isoformat(), simcard_id))
-    db.commit()
+async def check_simcard_status(simcard_id: str):
+    db = await get_db()
+    async with write_transaction(db):
+        cursor = await db.execute("""
+            SELECT id, code, status, assignedTo, assignedShopName, addedDate, saleDate, lastChecked
+            FROM simcards WHERE id = ?
+        """, (simcard_id,))
+        simcard = await cursor.fetchone()
+        
+        if not simcard:
+            raise HTTPException(status_code=404, detail="SimCard not found")
+        
+        # Update lastChecked
+        await db.execute("UPDATE simcards SET lastChecked = ? WHERE id = ?", 
+                         (datetime.now().isoformat(), simcard_id))
     
     return dict(simcard)
 
 @app.post("/simcards/auto-check")
-async def auto_check_simcards(request: Dict[str, Any], db = Depends(get_db)):
+async def auto_check_simcards(request: Dict[str, Any]):
+    db = await get_db()
     simcards = request.get("simCards", [])
-    cursor = db.cursor()
     
-    results = []
     timestamp = datetime.now().isoformat()
+    simcard_ids = orjson.dumps([simcard_data.get("id") for simcard_data in simcards]).decode()
+    
+    async with write_transaction(db):
+        # Get all requested simcards from database in one query
+        cursor = await db.execute("""
+            SELECT id, status, saleDate FROM simcards
+            WHERE id IN (SELECT value FROM json_each(?))
+        """, (simcard_ids,))
+        found = {simcard["id"]: simcard for simcard in await cursor.fetchall()}
+        
+        # Update lastChecked for every simcard that exists
+        await db.execute("""
+            UPDATE simcards SET lastChecked = ?
+            WHERE id IN (SELECT value FROM json_each(?))
+        """, (timestamp, simcard_ids))
     
+    results = []
     for simcard_data in simcards:
-        simcard_id = simcard_data.get("id")
-        
-        # Get current simcard from database
-        cursor.execute("SELECT * FROM simcards WHERE id = ?", (simcard_id,))
-        simcard = cursor.fetchone()
-        
+        simcard = found.get(simcard_data.get("id"))
         if simcard:
-            # Update lastChecked
-            cursor.execute("UPDATE simcards SET lastChecked = ? WHERE id = ?", 
-                           (timestamp, simcard_id))
-            
             results.append({
-                "simCardId": simcard_id,
+                "simCardId": simcard["id"],
                 "status": simcard["status"],
                 "isSold": simcard["status"] == "sold",
                 "saleDate": simcard["saleDate"],
                 "lastChecked": timestamp
             })
     
-    db.commit()
-    
     return {
         "results": results,
         "timestamp": timestamp
@@ -462,43 +615,54 @@ async def auto_check_simcards(request: Dict[str, Any], db = Depends(get_db)):
 
 # Statistics endpoints
 @app.get("/statistics")
-async def get_statistics(db = Depends(get_db)):
-    cursor = db.cursor()
+async def get_statistics():
+    cache_key = ("statistics", data_version)
+    cached = stats_cache.get(cache_key)
+    if cached is not None:
+        return cached
     
-    # Shop statistics
-    cursor.execute("SELECT COUNT(*) as total FROM shops")
-    total_shops = cursor.fetchone()["total"]
+    db = await get_db()
     
-    cursor.execute("SELECT COUNT(*) as active FROM shops WHERE status = 'active'")
-    active_shops = cursor.fetchone()["active"]
+    # Shop statistics
+    cursor = await db.execute("""
+        SELECT 
+            COUNT(*) as total,
+            COUNT(CASE WHEN status = 'active' THEN 1 END) as active
+        FROM shops
+    """)
+    shop_counts = await cursor.fetchone()
+    total_shops = shop_counts["total"]
+    active_shops = shop_counts["active"]
     
     # SimCard statistics
-    cursor.execute("SELECT COUNT(*) as total FROM simcards")
-    total_simcards = cursor.fetchone()["total"]
-    
-    cursor.execute("SELECT COUNT(*) as available FROM simcards WHERE status = 'available'")
-    available_simcards = cursor.fetchone()["available"]
-    
-    cursor.execute("SELECT COUNT(*) as assigned FROM simcards WHERE status = 'assigned'")
-    assigned_simcards = cursor.fetchone()["assigned"]
-    
-    cursor.execute("SELECT COUNT(*) as sold FROM simcards WHERE status = 'sold'")
-    sold_simcards = cursor.fetchone()["sold"]
+    cursor = await db.execute("""
+        SELECT 
+            COUNT(*) as total,
+            COUNT(CASE WHEN status = 'available' THEN 1 END) as available,
+            COUNT(CASE WHEN status = 'assigned' THEN 1 END) as assigned,
+            COUNT(CASE WHEN status = 'sold' THEN 1 END) as sold
+        FROM simcards
+    """)
+    simcard_counts = await cursor.fetchone()
+    total_simcards = simcard_counts["total"]
+    available_simcards = simcard_counts["available"]
+    assigned_simcards = simcard_counts["assigned"]
+    sold_simcards = simcard_counts["sold"]
     
     # Region statistics
-    cursor.execute("SELECT region, COUNT(*) as count FROM shops GROUP BY region")
-    region_stats_result = cursor.fetchall()
+    cursor = await db.execute("SELECT region, COUNT(*) as count FROM shops GROUP BY region")
+    region_stats_result = await cursor.fetchall()
     region_stats = {row["region"]: row["count"] for row in region_stats_result}
     
     # Sales by date (last 7 days based on actual sold simcards)
-    cursor.execute("""
+    cursor = await db.execute("""
         SELECT DATE(saleDate) as sale_date, COUNT(*) as count 
         FROM simcards 
         WHERE saleDate IS NOT NULL AND DATE(saleDate) >= DATE('now', '-7 days')
         GROUP BY DATE(saleDate)
         ORDER BY sale_date DESC
     """)
-    sales_data = cursor.fetchall()
+    sales_data = await cursor.fetchall()
     
     sales_by_date = {}
     for i in range(7):
@@ -509,7 +673,7 @@ async def get_statistics(db = Depends(get_db)):
         if sale["sale_date"] in sales_by_date:
             sales_by_date[sale["sale_date"]] = sale["count"]
     
-    return {
+    statistics = {
         "totalShops": total_shops,
         "activeShops": active_shops,
         "totalSimCards": total_simcards,
@@ -519,12 +683,19 @@ async def get_statistics(db = Depends(get_db)):
         "regionStats": region_stats,
         "salesByDate": sales_by_date
     }
+    stats_cache[cache_key] = statistics
+    
+    return statistics
 
 @app.get("/statistics/shops")
-async def get_shop_sales_stats(db = Depends(get_db)):
-    cursor = db.cursor()
-    
-    cursor.execute("""
+async def get_shop_sales_stats():
+    cache_key = ("shop_stats", data_version)
+    cached = stats_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    db = await get_db()
+    cursor = await db.execute("""
         SELECT 
             s.id,
             s.name,
@@ -536,7 +707,7 @@ async def get_shop_sales_stats(db = Depends(get_db)):
         GROUP BY s.id, s.name
     """)
     
-    results = cursor.fetchall()
+    results = await cursor.fetchall()
     
     shop_stats = {}
     for result in results:
@@ -545,9 +716,14 @@ async def get_shop_sales_stats(db = Depends(get_db)):
             "available": result["available"], 
             "total": result["total"]
         }
+    stats_cache[cache_key] = shop_stats
     
     return shop_stats
 
+@app.get("/pool/stats")
+async def get_pool_stats():
+    return db_pool.stats()
+
 # Health check
 @app.get("/")
 async def root():
@@ -557,4 +733,5 @@ if __name__ == "__main__":
     print("Initializing database...")
     init_database()
     print("Starting server on port 9022...")
-    uvicorn.run(app, host="0.0.0.0", port=9022)
\ No newline at end of file
+    uvicorn.run("malin:app", host="0.0.0.0", port=9022,
+                loop="uvloop", http="httptools", workers=os.cpu_count() or 1)
\ No newline at end of file
@@ -23,7 +23,6 @@ interface Shop {
   longitude?: number;
   status: 'active' | 'inactive';
   region: string;
-  assignedSimCards: string[]; // Array of SIM card IDs
   addedDate: string;
 }
 
@@ -73,7 +72,6 @@ const Shops = () => {
       longitude: formData.longitude,
       status: formData.status,
       region: formData.region,
-      assignedSimCards: [],
       addedDate: new Date().toISOString().split('T')[0]
     };
 
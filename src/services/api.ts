@@ -166,8 +166,10 @@ export interface Shop {
   longitude?: number;
   status: 'active' | 'inactive';
   region: string;
-  assignedSimCards: string[];
   addedDate: string;
+  assigned?: number;
+  sold?: number;
+  total?: number;
 }
 
 export interface SimCard {